@@ -2,13 +2,62 @@
 Byte Pair Encoding (BPE) Tokenizer for Odia Language
 """
 
+import os
 import re
 import json
-from collections import defaultdict, Counter
-from typing import Dict, List, Tuple, Set
+import heapq
+import struct
+from collections import defaultdict, Counter, OrderedDict
+from itertools import accumulate, chain, islice, repeat
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Set, Union
 import pickle
 
 
+# Maximum number of words kept in the per-tokenizer encode cache
+ENCODE_CACHE_SIZE = 8192
+
+# Pre-tokenization pattern, compiled once and shared by train() and encode()
+SPLIT_PATTERN = re.compile(r'\S+|\s+')
+
+# Training packs pairs of token ids into one int key: (left << PAIR_SHIFT) | right
+PAIR_SHIFT = 32
+PAIR_MASK = (1 << PAIR_SHIFT) - 1
+
+# Below this many texts encode_batch() stays in-process; pool startup dominates
+MIN_PARALLEL_TEXTS = 256
+
+# Number of texts pulled from a stream at a time by calculate_compression_ratio()
+STREAM_BATCH_SIZE = 10000
+
+# Binary tokenizer file header: magic, vocab_size, number of token slots, number of merges
+BINARY_MAGIC = b'BPE1'
+BINARY_HEADER = struct.Struct('<4sIII')
+
+
+def _to_utf8(text: Union[str, bytes]) -> bytes:
+    """Return text as UTF-8 bytes; bytes are assumed to be UTF-8 already."""
+    return text if isinstance(text, bytes) else text.encode('utf-8')
+
+
+def _write_atomic(filepath: str, data: Union[str, bytes]):
+    """
+    Write data next to filepath first and then move it into place.
+    
+    Readers never see a partially written file, and the temporary file is
+    removed if the write or the move fails.
+    """
+    tmp_file = filepath + '.tmp'
+    try:
+        with open(tmp_file, 'wb') as f:
+            f.write(_to_utf8(data))
+        os.replace(tmp_file, filepath)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
 class BPETokenizer:
     """
     A Byte Pair Encoding tokenizer implementation for Odia language.
@@ -24,8 +73,13 @@ class BPETokenizer:
         self.vocab_size = vocab_size
         self.vocab = {}  # token -> id mapping
         self.merges = []  # list of merge operations (pair, new_token)
+        self.bpe_ranks = {}  # (left id, right id) -> merge priority (index into merges)
+        self._merge_ids = []  # merge priority -> (left id, right id, merged id)
+        self._id_to_token = []  # token id -> token (None for unused ids)
+        self._encode_cache = OrderedDict()  # word -> token ids, LRU order
         self.byte_encoder = self._bytes_to_unicode()
         self.byte_decoder = {v: k for k, v in self.byte_encoder.items()}
+        self._build_byte_table()
         
     def _bytes_to_unicode(self) -> Dict[int, str]:
         """
@@ -43,123 +97,341 @@ class BPETokenizer:
         cs = [chr(n) for n in cs]
         return dict(zip(bs, cs))
     
-    def _get_stats(self, word_freqs: Dict[Tuple[str, ...], int]) -> Counter:
+    def _build_byte_table(self):
+        """
+        Precompute str.translate tables between latin-1 code points (one per
+        byte) and the byte-level unicode characters, in both directions, so
+        text can be converted in C instead of with a per-byte dictionary lookup.
         """
-        Count the frequency of adjacent pairs in the vocabulary.
+        self._byte_table = str.maketrans({b: self.byte_encoder[b] for b in range(256)})
+        self._inv_byte_table = {ord(c): b for c, b in self.byte_decoder.items()}
+    
+    def _to_byte_unicode(self, text_bytes: bytes) -> str:
+        """Convert UTF-8 encoded text to its byte-level unicode representation."""
+        return text_bytes.decode('latin-1').translate(self._byte_table)
+    
+    def _build_id_to_token(self):
+        """Rebuild the id -> token list used by decode() from the vocabulary."""
+        self._id_to_token = [None] * (max(self.vocab.values(), default=-1) + 1)
+        for token, idx in self.vocab.items():
+            self._id_to_token[idx] = token
+    
+    def _build_bpe_ranks(self):
+        """
+        Rebuild the pair -> rank lookup from the learned merges.
+        Pairs are keyed by token ids so the merge loop never touches strings.
+        Lower rank means the merge was learned earlier and is applied first.
+        Cached encodings are dropped since they depend on the merges.
+        """
+        self.bpe_ranks = {}
+        self._merge_ids = []
+        for rank, (left, right) in enumerate(self.merges):
+            pair = (self.vocab[left], self.vocab[right])
+            # Keep the earliest rank if a pair was learned twice
+            self.bpe_ranks.setdefault(pair, rank)
+            self._merge_ids.append(pair + (self.vocab[left + right],))
+        self._encode_cache.clear()
+    
+    def _build_symbol_list(self, word_freqs: Dict[Tuple[str, ...], int]) -> Tuple[List[int], List[int], List[int], List[int]]:
+        """
+        Flatten the words into a doubly linked list of symbols.
+        
+        Each node keeps the vocabulary id of its token, the frequency of the
+        word it belongs to and the positions of its neighbours (-1 at word
+        boundaries), so a merge only has to rewire the nodes it touches instead
+        of rebuilding every word. Storing ids rather than strings keeps pair
+        keys as cheap int tuples.
         
         Args:
             word_freqs: Dictionary mapping word tuples to their frequencies
             
         Returns:
-            Counter of pair frequencies
+            Parallel lists (symbols, prev_pos, next_pos, freqs)
         """
-        pairs = Counter()
+        symbols, prev_pos, next_pos, freqs = [], [], [], []
         for word, freq in word_freqs.items():
-            for i in range(len(word) - 1):
-                pairs[(word[i], word[i+1])] += freq
-        return pairs
+            start = len(symbols)
+            last = start + len(word) - 1
+            for pos in range(start, last + 1):
+                symbols.append(self.vocab[word[pos - start]])
+                prev_pos.append(pos - 1 if pos > start else -1)
+                next_pos.append(pos + 1 if pos < last else -1)
+                freqs.append(freq)
+        return symbols, prev_pos, next_pos, freqs
     
-    def _merge_vocab(self, pair: Tuple[str, str], word_freqs: Dict[Tuple[str, ...], int]) -> Dict[Tuple[str, ...], int]:
+    def _get_stats(self, symbols: List[int], next_pos: List[int], freqs: List[int]) -> Tuple[Counter, Dict[int, Set[int]]]:
         """
-        Merge all occurrences of the most frequent pair.
+        Count the frequency of adjacent pairs in the symbol list.
         
         Args:
-            pair: The pair to merge
-            word_freqs: Current word frequencies
+            symbols: Token id at each position
+            next_pos: Position of the right neighbour (-1 at word end)
+            freqs: Frequency of the word each position belongs to
             
         Returns:
-            Updated word frequencies after merge
+            Counter of packed pair frequencies and a mapping from each packed
+            pair to the positions of its left symbol
+        """
+        pairs = Counter()
+        positions = defaultdict(set)
+        for pos, (left, right, freq) in enumerate(zip(symbols, next_pos, freqs)):
+            if right != -1:
+                pair = (left << PAIR_SHIFT) | symbols[right]
+                pairs[pair] += freq
+                positions[pair].add(pos)
+        return pairs, positions
+    
+    def _merge_pair(self, pair: int, replacement: int, symbols: List[int], prev_pos: List[int], next_pos: List[int],
+                    freqs: List[int], pairs: Counter, positions: Dict[int, Set[int]], heap: List):
         """
-        new_word_freqs = {}
-        bigram = ' '.join(pair)
-        replacement = ''.join(pair)
+        Merge all occurrences of a pair in place.
         
-        for word, freq in word_freqs.items():
-            new_word = []
-            i = 0
-            while i < len(word):
-                if i < len(word) - 1 and word[i] == pair[0] and word[i+1] == pair[1]:
-                    new_word.append(replacement)
-                    i += 2
-                else:
-                    new_word.append(word[i])
-                    i += 1
-            new_word_freqs[tuple(new_word)] = freq
+        Only the pairs overlapping a merged position are recounted; their new
+        frequencies are pushed onto the heap (stale entries are skipped when
+        popped).
         
-        return new_word_freqs
+        Args:
+            pair: The packed pair of token ids to merge
+            replacement: Token id of the merged token
+            symbols, prev_pos, next_pos, freqs: Symbol list from _build_symbol_list
+            pairs, positions: Pair statistics from _get_stats, updated in place
+            heap: Max-heap of (-frequency, pair) entries, updated in place
+        """
+        left, right = pair >> PAIR_SHIFT, pair & PAIR_MASK
+        changed = set()
+        
+        def update(other: int, pos: int, delta: int):
+            pairs[other] += delta
+            if delta > 0:
+                positions[other].add(pos)
+            else:
+                positions[other].discard(pos)
+            if pairs[other] <= 0:
+                del pairs[other]
+                positions.pop(other, None)
+            changed.add(other)
+        
+        # Left-to-right order so overlapping occurrences (e.g. "a a a") merge greedily
+        for pos in sorted(positions.pop(pair, ())):
+            nxt = next_pos[pos]
+            # Skip occurrences consumed by an earlier merge in this pass
+            if symbols[pos] != left or nxt == -1 or symbols[nxt] != right:
+                continue
+            
+            freq = freqs[pos]
+            before = prev_pos[pos]
+            after = next_pos[nxt]
+            
+            if before != -1:
+                update((symbols[before] << PAIR_SHIFT) | left, before, -freq)
+            if after != -1:
+                update((right << PAIR_SHIFT) | symbols[after], nxt, -freq)
+            
+            # Splice the right symbol out of the list
+            symbols[pos] = replacement
+            symbols[nxt] = None
+            next_pos[pos] = after
+            if after != -1:
+                prev_pos[after] = pos
+            
+            if before != -1:
+                update((symbols[before] << PAIR_SHIFT) | replacement, before, freq)
+            if after != -1:
+                update((replacement << PAIR_SHIFT) | symbols[after], pos, freq)
+        
+        pairs.pop(pair, None)
+        for other in changed:
+            if other in pairs:
+                heapq.heappush(heap, (-pairs[other], other))
     
-    def train(self, texts: List[str], verbose: bool = True):
+    def train(self, texts: Iterable[Union[str, bytes]], verbose: bool = True,
+              callback: Optional[Callable[['BPETokenizer', int], bool]] = None):
         """
         Train the BPE tokenizer on a corpus of texts.
         
+        The texts are consumed in a single pass and only word frequencies are
+        kept, so a generator over a large corpus file never has to fit in memory.
+        
+        Args:
+            texts: Iterable of text strings (or UTF-8 encoded bytes) to train on
+            verbose: Whether to print progress information
+            callback: Optional function called after every merge as
+                callback(tokenizer, vocab_size), where vocab_size is the
+                target that would have ended training at this merge. The
+                encode lookups are only rebuilt when training ends; call
+                tokenizer.set_active_merges(len(tokenizer.merges)) before
+                encoding with the current state. Returning True stops
+                training here and sets self.vocab_size to that vocab_size.
+        """
+        # Preprocess: convert text to bytes and then to unicode characters,
+        # split into words (keeping whitespace as part of words) and count the
+        # raw strings; hashing a str is much cheaper than a tuple. The steps
+        # are chained with map() so Counter.update() drives the pass in C.
+        num_texts = 0
+        
+        def counted(texts):
+            nonlocal num_texts
+            for text in texts:
+                num_texts += 1
+                yield text
+        
+        text_unicode = map(self._to_byte_unicode, map(_to_utf8, counted(texts)))
+        word_counts = Counter()
+        word_counts.update(chain.from_iterable(map(SPLIT_PATTERN.findall, text_unicode)))
+        
+        self._train_on_word_counts(word_counts, num_texts, verbose, callback)
+    
+    def train_weighted(self, text_counts: Iterable[Tuple[Union[str, bytes], int]], verbose: bool = True,
+                       callback: Optional[Callable[['BPETokenizer', int], bool]] = None):
+        """
+        Train the BPE tokenizer on (text, count) pairs, e.g. Counter(texts).items().
+        
+        Each distinct text is converted and split once and its words are
+        weighted by its count, so repeated texts add no counting work.
+        
+        Args:
+            text_counts: Iterable of (text, count) pairs; texts may be str or
+                UTF-8 encoded bytes
+            verbose: Whether to print progress information
+            callback: Optional early-stopping hook, see train()
+        """
+        word_counts = Counter()
+        num_texts = 0
+        for text, text_count in text_counts:
+            num_texts += text_count
+            for word in SPLIT_PATTERN.findall(self._to_byte_unicode(_to_utf8(text))):
+                word_counts[word] += text_count
+        
+        self._train_on_word_counts(word_counts, num_texts, verbose, callback)
+    
+    def _train_on_word_counts(self, word_counts: Counter, num_texts: int, verbose: bool,
+                              callback: Optional[Callable[['BPETokenizer', int], bool]] = None):
+        """
+        Learn the merges from pre-token counts gathered by the train methods.
+        
         Args:
-            texts: List of text strings to train on
+            word_counts: Byte-level unicode pre-token -> frequency
+            num_texts: Number of texts the counts came from (for reporting)
             verbose: Whether to print progress information
+            callback: Optional early-stopping hook, see train()
         """
         if verbose:
             print(f"Training BPE tokenizer with vocab_size={self.vocab_size}")
-            print(f"Corpus size: {len(texts)} texts")
-        
-        # Preprocess: convert text to bytes and then to unicode characters
-        word_freqs = Counter()
-        for text in texts:
-            # Convert text to bytes then to our unicode representation
-            text_bytes = text.encode('utf-8')
-            text_unicode = ''.join(self.byte_encoder[b] for b in text_bytes)
-            
-            # Split into words (keeping whitespace as part of words)
-            words = re.findall(r'\S+|\s+', text_unicode)
-            for word in words:
-                # Split word into characters with end-of-word marker
-                word_tuple = tuple(list(word) + ['</w>'])
-                word_freqs[word_tuple] += 1
+        
+        # Split each unique word into characters with end-of-word marker,
+        # most frequent first
+        word_freqs = {tuple(word) + ('</w>',): freq for word, freq in word_counts.most_common()}
         
         if verbose:
+            print(f"Corpus size: {num_texts} texts")
             print(f"Initial vocabulary size: {sum(len(set(word)) for word in word_freqs.keys())}")
             total_chars = sum(len(word) * freq for word, freq in word_freqs.items())
             print(f"Total characters: {total_chars}")
         
+        # Start from scratch; merges of a previous train() or load() refer to
+        # tokens that may not exist in the new vocabulary
+        self.merges = []
+        
         # Build initial vocabulary from all unique characters
         vocab = set()
         for word in word_freqs.keys():
             vocab.update(word)
         
         # Add base vocabulary
-        self.vocab = {token: idx for idx, token in enumerate(sorted(vocab))}
+        id_to_token = sorted(vocab)
+        self.vocab = {token: idx for idx, token in enumerate(id_to_token)}
         
         if verbose:
             print(f"Base vocabulary size: {len(self.vocab)}")
         
         # Perform BPE merges
-        num_merges = self.vocab_size - len(self.vocab)
+        num_base = len(self.vocab)
+        num_merges = self.vocab_size - num_base
+        
+        symbols, prev_pos, next_pos, freqs = self._build_symbol_list(word_freqs)
+        pairs, positions = self._get_stats(symbols, next_pos, freqs)
+        heap = [(-freq, pair) for pair, freq in pairs.items()]
+        heapq.heapify(heap)
         
         for i in range(num_merges):
-            pairs = self._get_stats(word_freqs)
+            # Pop the most frequent pair, skipping entries whose count is stale
+            best_pair = None
+            while heap:
+                neg_freq, pair = heapq.heappop(heap)
+                if pairs.get(pair) == -neg_freq:
+                    best_pair = pair
+                    break
             
-            if not pairs:
+            if best_pair is None:
                 if verbose:
                     print(f"No more pairs to merge at iteration {i}")
                 break
             
-            best_pair = max(pairs, key=pairs.get)
+            merge = (id_to_token[best_pair >> PAIR_SHIFT], id_to_token[best_pair & PAIR_MASK])
             
             if verbose and i % 100 == 0:
-                print(f"Merge {i}/{num_merges}: {best_pair} (freq: {pairs[best_pair]})")
-            
-            # Merge the best pair
-            word_freqs = self._merge_vocab(best_pair, word_freqs)
+                print(f"Merge {i}/{num_merges}: {merge} (freq: {pairs[best_pair]})")
             
             # Add to vocabulary and merges
-            new_token = ''.join(best_pair)
-            self.merges.append(best_pair)
+            new_token = ''.join(merge)
+            self.merges.append(merge)
             if new_token not in self.vocab:
                 self.vocab[new_token] = len(self.vocab)
+                id_to_token.append(new_token)
+            
+            # Merge the best pair
+            self._merge_pair(best_pair, self.vocab[new_token], symbols, prev_pos, next_pos, freqs, pairs, positions, heap)
+            
+            if callback is not None and callback(self, num_base + i + 1):
+                self.vocab_size = num_base + i + 1
+                if verbose:
+                    print(f"Stopped by callback at vocab_size={self.vocab_size}")
+                break
+        
+        self._build_id_to_token()
+        self._build_bpe_ranks()
         
         if verbose:
             print(f"\nFinal vocabulary size: {len(self.vocab)}")
             print(f"Number of merges: {len(self.merges)}")
     
-    def _tokenize_word(self, word: str) -> List[str]:
+    def merges_for_vocab_size(self, vocab_size: int) -> int:
+        """
+        Number of merges that training with vocab_size on the same corpus learns.
+        
+        Args:
+            vocab_size: Target vocabulary size, at most this tokenizer's
+            
+        Returns:
+            Length of the prefix of self.merges such a run would produce
+        """
+        # Base tokens are single byte characters plus '</w>'; merged tokens
+        # are always longer and get ids after every base token
+        num_base = sum(1 for token in self.vocab if len(token) == 1 or token == '</w>')
+        return min(max(vocab_size - num_base, 0), len(self.merges))
+    
+    def set_active_merges(self, num_merges: int):
+        """
+        Keep only the first num_merges merges and the tokens they create.
+        
+        Merges are learned greedily in a fixed order, so this turns the
+        tokenizer into the one a shorter training run would give, in place
+        and without retraining. Later merges are discarded. The encode and
+        decode lookups are rebuilt, which also makes the merges learned so
+        far usable from a train() callback. vocab_size is left unchanged.
+        
+        Args:
+            num_merges: Number of merges to keep, see merges_for_vocab_size()
+        """
+        if num_merges < len(self.merges):
+            self.merges = self.merges[:num_merges]
+            merged = {left + right for left, right in self.merges}
+            self.vocab = {token: idx for token, idx in self.vocab.items()
+                          if len(token) == 1 or token == '</w>' or token in merged}
+        self._build_id_to_token()
+        self._build_bpe_ranks()
+    
+    def _tokenize_word(self, word: str) -> List[int]:
         """
         Tokenize a single word using learned merges.
         
@@ -167,75 +439,111 @@ class BPETokenizer:
             word: Word to tokenize (in byte-encoded unicode)
             
         Returns:
-            List of tokens
+            List of token IDs
         """
-        # Start with character-level tokenization
-        word = tuple(list(word) + ['</w>'])
+        # Start with character-level ids; characters missing from the
+        # vocabulary get -1, never merge and are dropped at the end
+        word = [self.vocab.get(char, -1) for char in word]
+        word.append(self.vocab.get('</w>', -1))
+        ranks = self.bpe_ranks
+        no_merge = float('inf')
         
         # Apply merges
         while len(word) > 1:
-            pairs = [(word[i], word[i+1]) for i in range(len(word)-1)]
-            
-            # Find the earliest merge that applies
-            min_merge_idx = float('inf')
-            best_pair = None
-            
-            for pair in pairs:
-                if pair in self.merges:
-                    merge_idx = self.merges.index(pair)
-                    if merge_idx < min_merge_idx:
-                        min_merge_idx = merge_idx
-                        best_pair = pair
+            # Find the earliest merge that applies (lookups run in C via map)
+            rank = min(map(ranks.get, zip(word, word[1:]), repeat(no_merge)))
             
-            if best_pair is None:
+            if rank == no_merge:
                 break
+            left, right, merged_id = self._merge_ids[rank]
             
-            # Apply the merge
-            new_word = []
-            i = 0
-            while i < len(word):
-                if i < len(word) - 1 and word[i] == best_pair[0] and word[i+1] == best_pair[1]:
-                    new_word.append(''.join(best_pair))
-                    i += 2
+            # Apply the merge in place: read at r, write at w (w <= r), starting
+            # from the first occurrence of the left symbol
+            n = len(word)
+            r = w = word.index(left)
+            while r < n:
+                if word[r] == left and r < n - 1 and word[r+1] == right:
+                    word[w] = merged_id
+                    r += 2
                 else:
-                    new_word.append(word[i])
-                    i += 1
-            word = tuple(new_word)
+                    word[w] = word[r]
+                    r += 1
+                w += 1
+            del word[w:]
         
-        return list(word)
+        return [token_id for token_id in word if token_id != -1]
     
-    def encode(self, text: str) -> List[int]:
+    def encode(self, text: Union[str, bytes]) -> List[int]:
         """
         Encode text into token IDs.
         
         Args:
-            text: Input text
+            text: Input text, or the text already encoded as UTF-8 bytes
             
         Returns:
             List of token IDs
         """
-        # Convert text to bytes then to unicode
-        text_bytes = text.encode('utf-8')
-        text_unicode = ''.join(self.byte_encoder[b] for b in text_bytes)
+        return self._encode_bytes(_to_utf8(text))
+    
+    def _encode_bytes(self, text_bytes: bytes) -> List[int]:
+        """
+        Encode UTF-8 encoded text into token IDs.
+        
+        Args:
+            text_bytes: Input text as UTF-8 bytes
+            
+        Returns:
+            List of token IDs
+        """
+        # Convert bytes to unicode
+        text_unicode = self._to_byte_unicode(text_bytes)
         
         # Split into words
-        words = re.findall(r'\S+|\s+', text_unicode)
+        words = SPLIT_PATTERN.findall(text_unicode)
         
-        # Tokenize each word
+        # Tokenize each word, reusing cached results for repeated words
         token_ids = []
+        extend = token_ids.extend
+        encode_word = self._encode_word
         for word in words:
-            tokens = self._tokenize_word(word)
-            for token in tokens:
-                if token in self.vocab:
-                    token_ids.append(self.vocab[token])
-                else:
-                    # Fallback: tokenize character by character
-                    for char in token:
-                        if char in self.vocab:
-                            token_ids.append(self.vocab[char])
+            extend(encode_word(word))
         
         return token_ids
     
+    def _encode_word(self, word: str) -> Tuple[int, ...]:
+        """
+        Encode a single pre-token into token IDs.
+        
+        Shared by encoding and calculate_compression_ratio_packed(), so both
+        always agree on the number of tokens per word.
+        
+        Args:
+            word: Pre-token in byte-level unicode
+            
+        Returns:
+            Tuple of token IDs
+        """
+        # Whole pre-token already in the vocab: no merging needed
+        token_id = self.vocab.get(word + '</w>')
+        if token_id is not None:
+            return (token_id,)
+        # The cache is shared by threads encoding with the same tokenizer (e.g.
+        # the Gradio app), so another thread may evict a word between the
+        # steps below; the ids already looked up stay valid either way
+        cache = self._encode_cache
+        word_ids = cache.get(word)
+        try:
+            if word_ids is None:
+                word_ids = tuple(self._tokenize_word(word))
+                cache[word] = word_ids
+                if len(cache) > ENCODE_CACHE_SIZE:
+                    cache.popitem(last=False)
+            else:
+                cache.move_to_end(word)
+        except KeyError:
+            pass
+        return word_ids
+    
     def decode(self, token_ids: List[int]) -> str:
         """
         Decode token IDs back into text.
@@ -246,37 +554,119 @@ class BPETokenizer:
         Returns:
             Decoded text string
         """
-        # Create reverse vocabulary
-        id_to_token = {idx: token for token, idx in self.vocab.items()}
-        
-        # Get tokens
-        tokens = [id_to_token[tid] for tid in token_ids if tid in id_to_token]
+        # Get tokens, skipping ids outside the vocabulary
+        id_to_token = self._id_to_token
+        num_ids = len(id_to_token)
+        tokens = [id_to_token[tid] for tid in token_ids
+                  if 0 <= tid < num_ids and id_to_token[tid] is not None]
         
         # Join tokens and remove end-of-word markers
         text_unicode = ''.join(tokens).replace('</w>', '')
         
         # Convert back to bytes then to UTF-8 string
         try:
-            text_bytes = bytes([self.byte_decoder[c] for c in text_unicode])
+            text_bytes = text_unicode.translate(self._inv_byte_table).encode('latin-1')
             text = text_bytes.decode('utf-8', errors='replace')
         except:
             text = text_unicode  # Fallback
         
         return text
     
-    def calculate_compression_ratio(self, texts: List[str]) -> float:
+    def encode_plus(self, text: str) -> Dict[str, any]:
+        """
+        Encode text and decode it back in one call.
+        
+        The UTF-8 bytes are computed once and shared by encoding and the size
+        statistics, for callers that report all of them (e.g. the Gradio app).
+        
+        Args:
+            text: Input text
+            
+        Returns:
+            Dictionary with the token IDs, the decoded text, the UTF-8 size in
+            bytes and the compression ratio
+        """
+        text_bytes = text.encode('utf-8')
+        token_ids = self._encode_bytes(text_bytes)
+        num_bytes = len(text_bytes)
+        return {
+            'token_ids': token_ids,
+            'decoded': self.decode(token_ids),
+            'num_bytes': num_bytes,
+            'compression_ratio': num_bytes / len(token_ids) if token_ids else 0.0,
+        }
+    
+    def encode_batch(self, texts: List[Union[str, bytes]], num_workers: Optional[int] = None) -> List[List[int]]:
+        """
+        Encode many texts, spreading them over worker processes.
+        
+        Each worker rebuilds the tokenizer once from its serialized state and
+        then encodes a contiguous chunk of texts. Small batches, or a single
+        worker, are encoded in this process.
+        
+        Args:
+            texts: List of texts (str or UTF-8 bytes) to encode
+            num_workers: Number of worker processes (defaults to os.cpu_count())
+            
+        Returns:
+            List of token ID lists, in the same order as texts
+        """
+        num_workers = num_workers or os.cpu_count() or 1
+        if num_workers <= 1 or len(texts) < MIN_PARALLEL_TEXTS:
+            return [self.encode(text) for text in texts]
+        
+        with self._make_worker_pool(num_workers) as pool:
+            return self._encode_in_pool(pool, texts, num_workers)
+    
+    def _make_worker_pool(self, num_workers: int) -> ProcessPoolExecutor:
+        """Start worker processes that each hold a copy of this tokenizer."""
+        return ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                   initargs=(self._get_state(),))
+    
+    @staticmethod
+    def _encode_in_pool(pool: ProcessPoolExecutor, texts: List[Union[str, bytes]],
+                        num_workers: int) -> List[List[int]]:
+        """Encode texts on a pool from _make_worker_pool(), one chunk per worker."""
+        chunksize = -(-len(texts) // num_workers)
+        return list(pool.map(_encode_in_worker, texts, chunksize=chunksize))
+    
+    def calculate_compression_ratio(self, texts: Iterable[Union[str, bytes]]) -> float:
         """
         Calculate the compression ratio on a set of texts.
         Compression ratio = original_bytes / encoded_tokens
         
+        The texts are read in batches of STREAM_BATCH_SIZE, so a generator
+        over a large corpus is never fully materialized. Large batches are
+        encoded on one worker pool that is started on first use and shared
+        by all batches of the call.
+        
         Args:
-            texts: List of texts to evaluate
+            texts: Iterable of texts (str or UTF-8 bytes) to evaluate
             
         Returns:
             Compression ratio
         """
-        total_bytes = sum(len(text.encode('utf-8')) for text in texts)
-        total_tokens = sum(len(self.encode(text)) for text in texts)
+        total_bytes = 0
+        total_tokens = 0
+        num_workers = os.cpu_count() or 1
+        pool = None
+        texts = iter(texts)
+        try:
+            while True:
+                batch = list(islice(texts, STREAM_BATCH_SIZE))
+                if not batch:
+                    break
+                total_bytes += sum(map(len, map(_to_utf8, batch)))
+                if num_workers <= 1 or len(batch) < MIN_PARALLEL_TEXTS:
+                    batch_ids = map(self.encode, batch)
+                else:
+                    if pool is None:
+                        pool = self._make_worker_pool(num_workers)
+                    batch_ids = self._encode_in_pool(pool, batch, num_workers)
+                total_tokens += sum(map(len, batch_ids))
+        finally:
+            if pool is not None:
+                pool.shutdown()
         
         if total_tokens == 0:
             return 0.0
@@ -284,28 +674,143 @@ class BPETokenizer:
         compression_ratio = total_bytes / total_tokens
         return compression_ratio
     
+    def calculate_compression_ratio_packed(self, buf: bytes, offsets: Sequence[int]) -> float:
+        """
+        Calculate the compression ratio of texts packed into one UTF-8 buffer.
+        
+        Text i is buf[offsets[i]:offsets[i+1]]. Gives the same result as
+        calculate_compression_ratio() on the individual texts. The whole
+        buffer is converted to byte-level unicode in a single call; since
+        every byte becomes one character, the byte offsets index the
+        converted string directly. Only token counts are needed, so each
+        distinct pre-token is tokenized once, weighted by how often it occurs.
+        
+        Args:
+            buf: Concatenated UTF-8 encoded texts
+            offsets: len(texts) + 1 increasing byte offsets into buf
+            
+        Returns:
+            Compression ratio
+        """
+        text_unicode = self._to_byte_unicode(bytes(buf))
+        texts = map(text_unicode.__getitem__, map(slice, offsets, islice(offsets, 1, None)))
+        word_counts = Counter()
+        word_counts.update(chain.from_iterable(map(SPLIT_PATTERN.findall, texts)))
+        
+        total_tokens = 0
+        for word, freq in word_counts.items():
+            total_tokens += freq * len(self._encode_word(word))
+        
+        if total_tokens == 0:
+            return 0.0
+        
+        return (offsets[-1] - offsets[0]) / total_tokens
+    
+    def _get_state(self) -> Dict:
+        """
+        Get the learned state as plain JSON-serializable data.
+        
+        Only the vocabulary and merges are included; the byte encoder is
+        deterministic and rebuilt by _set_state().
+        """
+        return {
+            'vocab_size': self.vocab_size,
+            'vocab': self.vocab,
+            'merges': [list(pair) for pair in self.merges],
+        }
+    
+    def _set_state(self, data: Dict):
+        """Restore the learned state produced by _get_state()."""
+        self.vocab_size = data['vocab_size']
+        self.vocab = data['vocab']
+        self.merges = [tuple(pair) for pair in data['merges']]
+        self.byte_encoder = self._bytes_to_unicode()
+        self.byte_decoder = {v: k for k, v in self.byte_encoder.items()}
+        self._build_byte_table()
+        self._build_id_to_token()
+        self._build_bpe_ranks()
+    
     def save(self, filepath: str):
-        """Save the tokenizer to a file."""
-        with open(filepath, 'wb') as f:
-            pickle.dump({
-                'vocab_size': self.vocab_size,
-                'vocab': self.vocab,
-                'merges': self.merges,
-                'byte_encoder': self.byte_encoder,
-            }, f)
+        """
+        Save the tokenizer to a JSON file.
+        
+        The file is written atomically, so readers never see a partially
+        written tokenizer.
+        """
+        _write_atomic(filepath, json.dumps(self._get_state(), ensure_ascii=False))
         print(f"Tokenizer saved to {filepath}")
     
-    def load(self, filepath: str):
-        """Load the tokenizer from a file."""
+    def save_binary(self, filepath: str):
+        """
+        Save the tokenizer in a compact binary format.
+        
+        Layout (little-endian): BINARY_HEADER, then uint32 end offsets of each
+        token in a UTF-8 blob (tokens in id order, empty for unused ids),
+        then the blob, then the merges as int32 (left id, right id) pairs.
+        Like save(), the file is written atomically.
+        """
+        token_bytes = [(token or '').encode('utf-8') for token in self._id_to_token]
+        ends = accumulate(map(len, token_bytes))
+        merge_ids = chain.from_iterable(
+            (self.vocab[left], self.vocab[right]) for left, right in self.merges)
+        
+        _write_atomic(filepath, b''.join([
+            BINARY_HEADER.pack(BINARY_MAGIC, self.vocab_size, len(token_bytes), len(self.merges)),
+            struct.pack(f'<{len(token_bytes)}I', *ends),
+            b''.join(token_bytes),
+            struct.pack(f'<{2 * len(self.merges)}i', *merge_ids),
+        ]))
+        print(f"Tokenizer saved to {filepath}")
+    
+    def _read_binary(self, filepath: str) -> Dict:
+        """Read a file written by save_binary() into _set_state() data."""
         with open(filepath, 'rb') as f:
-            data = pickle.load(f)
-            self.vocab_size = data['vocab_size']
-            self.vocab = data['vocab']
-            self.merges = data['merges']
-            self.byte_encoder = data['byte_encoder']
-            self.byte_decoder = {v: k for k, v in self.byte_encoder.items()}
+            data = f.read()
+        magic, vocab_size, num_tokens, num_merges = BINARY_HEADER.unpack_from(data)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"{filepath} is not a binary BPE tokenizer file")
+        pos = BINARY_HEADER.size
+        
+        # Explicit little-endian formats, independent of the host's byte
+        # order and native item sizes
+        ends_format = struct.Struct(f'<{num_tokens}I')
+        ends = ends_format.unpack_from(data, pos)
+        pos += ends_format.size
+        merge_ids = struct.unpack_from(f'<{2 * num_merges}i', data, pos + (ends[-1] if ends else 0))
+        
+        id_to_token = [data[pos + start:pos + end].decode('utf-8')
+                       for start, end in zip(chain((0,), ends), ends)]
+        return {
+            'vocab_size': vocab_size,
+            'vocab': {token: idx for idx, token in enumerate(id_to_token) if token},
+            'merges': list(zip(map(id_to_token.__getitem__, merge_ids[0::2]),
+                               map(id_to_token.__getitem__, merge_ids[1::2]))),
+        }
+    
+    def load(self, filepath: str):
+        """
+        Load the tokenizer from a file.
+        
+        Files ending in .bin are read as written by save_binary(), files
+        ending in .pkl with the legacy pickle format, anything else is read
+        as JSON (see save()).
+        """
+        if filepath.endswith('.bin'):
+            data = self._read_binary(filepath)
+        elif filepath.endswith('.pkl'):
+            with open(filepath, 'rb') as f:
+                data = pickle.load(f)
+        else:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        self._set_state(data)
         print(f"Tokenizer loaded from {filepath}")
     
+    @property
+    def id_to_token(self) -> List[Optional[str]]:
+        """Tokens indexed by ID (None for IDs not in the vocabulary)."""
+        return self._id_to_token
+    
     def get_stats(self) -> Dict[str, any]:
         """Get statistics about the tokenizer."""
         return {
@@ -314,3 +819,18 @@ class BPETokenizer:
             'target_vocab_size': self.vocab_size,
         }
 
+
+# Tokenizer used by encode_batch() worker processes, set once per worker
+_worker_tokenizer = None
+
+
+def _init_worker(state: Dict):
+    """Rebuild the tokenizer in a worker process from its serialized state."""
+    global _worker_tokenizer
+    _worker_tokenizer = BPETokenizer()
+    _worker_tokenizer._set_state(state)
+
+
+def _encode_in_worker(text: Union[str, bytes]) -> List[int]:
+    """Encode a single text with the worker's tokenizer."""
+    return _worker_tokenizer.encode(text)
@@ -4,7 +4,9 @@ Evaluate and visualize BPE tokenizer performance
 
 import pickle
 from bpe_tokenizer import BPETokenizer
-from typing import List
+from collections import Counter
+from itertools import islice
+from typing import Iterator, List
 import json
 
 
@@ -15,6 +17,15 @@ def load_tokenizer(filepath: str) -> BPETokenizer:
     return tokenizer
 
 
+def iter_corpus(corpus_file: str) -> Iterator[str]:
+    """Yield the stripped, non-empty lines of a corpus file one at a time."""
+    with open(corpus_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
 def evaluate_on_samples(tokenizer: BPETokenizer, texts: List[str]):
     """
     Evaluate tokenizer on sample texts and show examples.
@@ -61,8 +72,8 @@ def analyze_vocabulary(tokenizer: BPETokenizer):
     
     vocab = tokenizer.vocab
     
-    # Sort by token ID
-    sorted_vocab = sorted(vocab.items(), key=lambda x: x[1])
+    # Tokens are stored by ID, so this is already sorted without a sort
+    sorted_vocab = [(token, idx) for idx, token in enumerate(tokenizer.id_to_token) if token is not None]
     
     print(f"Total vocabulary size: {len(vocab)}")
     print(f"\nFirst 30 tokens:")
@@ -77,10 +88,7 @@ def analyze_vocabulary(tokenizer: BPETokenizer):
         print(f"  {idx:4d}: {token_display}")
     
     # Token length distribution
-    token_lengths = {}
-    for token in vocab.keys():
-        length = len(token)
-        token_lengths[length] = token_lengths.get(length, 0) + 1
+    token_lengths = Counter(len(token) for token in vocab)
     
     print(f"\nToken length distribution:")
     for length in sorted(token_lengths.keys())[:20]:  # Show first 20
@@ -123,17 +131,16 @@ def generate_report(tokenizer: BPETokenizer, corpus_file: str = "odia_corpus.txt
     print("COMPREHENSIVE EVALUATION REPORT")
     print("="*80)
     
-    # Load corpus
+    # Load the sample texts; the full corpus is streamed for the compression ratio
     try:
-        with open(corpus_file, 'r', encoding='utf-8') as f:
-            texts = [line.strip() for line in f if line.strip()]
+        samples = list(islice(iter_corpus(corpus_file), 5))
     except FileNotFoundError:
         print(f"Corpus file {corpus_file} not found!")
         return
     
     # Overall statistics
     stats = tokenizer.get_stats()
-    compression_ratio = tokenizer.calculate_compression_ratio(texts)
+    compression_ratio = tokenizer.calculate_compression_ratio(iter_corpus(corpus_file))
     
     print(f"\n📊 Overall Statistics:")
     print(f"  Vocabulary Size: {stats['vocab_size']}")
@@ -149,7 +156,7 @@ def generate_report(tokenizer: BPETokenizer, corpus_file: str = "odia_corpus.txt
     
     # Detailed analysis
     analyze_vocabulary(tokenizer)
-    evaluate_on_samples(tokenizer, texts)
+    evaluate_on_samples(tokenizer, samples)
     compare_with_different_texts(tokenizer)
     
     # Summary
@@ -175,9 +182,10 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         tokenizer_file = sys.argv[1]
     else:
-        # Try to find a tokenizer file
+        # Try to find a tokenizer file (binary, then JSON, then legacy pickles)
         import glob
-        tokenizer_files = glob.glob("odia_bpe_tokenizer_*.pkl")
+        tokenizer_files = (glob.glob("odia_bpe_tokenizer_*.bin") or glob.glob("odia_bpe_tokenizer_*.json")
+                           or glob.glob("odia_bpe_tokenizer_*.pkl"))
         if tokenizer_files:
             tokenizer_file = sorted(tokenizer_files)[-1]  # Use most recent
             print(f"Using tokenizer file: {tokenizer_file}")
@@ -4,112 +4,9 @@ Deploy this on Hugging Face Spaces
 """
 
 import gradio as gr
-import pickle
-from typing import List, Dict
 import json
 
-
-class BPETokenizer:
-    """
-    A Byte Pair Encoding tokenizer implementation for Odia language.
-    """
-    
-    def __init__(self, vocab_size: int = 5000):
-        self.vocab_size = vocab_size
-        self.vocab = {}
-        self.merges = []
-        self.byte_encoder = self._bytes_to_unicode()
-        self.byte_decoder = {v: k for k, v in self.byte_encoder.items()}
-        
-    def _bytes_to_unicode(self) -> Dict[int, str]:
-        """Create a mapping from bytes to unicode characters."""
-        bs = list(range(ord("!"), ord("~")+1)) + list(range(ord("¡"), ord("¬")+1)) + list(range(ord("®"), ord("ÿ")+1))
-        cs = bs[:]
-        n = 0
-        for b in range(2**8):
-            if b not in bs:
-                bs.append(b)
-                cs.append(2**8+n)
-                n += 1
-        cs = [chr(n) for n in cs]
-        return dict(zip(bs, cs))
-    
-    def _tokenize_word(self, word: str) -> List[str]:
-        """Tokenize a single word using learned merges."""
-        import re
-        word = tuple(list(word) + ['</w>'])
-        
-        while len(word) > 1:
-            pairs = [(word[i], word[i+1]) for i in range(len(word)-1)]
-            min_merge_idx = float('inf')
-            best_pair = None
-            
-            for pair in pairs:
-                if pair in self.merges:
-                    merge_idx = self.merges.index(pair)
-                    if merge_idx < min_merge_idx:
-                        min_merge_idx = merge_idx
-                        best_pair = pair
-            
-            if best_pair is None:
-                break
-            
-            new_word = []
-            i = 0
-            while i < len(word):
-                if i < len(word) - 1 and word[i] == best_pair[0] and word[i+1] == best_pair[1]:
-                    new_word.append(''.join(best_pair))
-                    i += 2
-                else:
-                    new_word.append(word[i])
-                    i += 1
-            word = tuple(new_word)
-        
-        return list(word)
-    
-    def encode(self, text: str) -> List[int]:
-        """Encode text into token IDs."""
-        import re
-        text_bytes = text.encode('utf-8')
-        text_unicode = ''.join(self.byte_encoder[b] for b in text_bytes)
-        words = re.findall(r'\S+|\s+', text_unicode)
-        
-        token_ids = []
-        for word in words:
-            tokens = self._tokenize_word(word)
-            for token in tokens:
-                if token in self.vocab:
-                    token_ids.append(self.vocab[token])
-                else:
-                    for char in token:
-                        if char in self.vocab:
-                            token_ids.append(self.vocab[char])
-        
-        return token_ids
-    
-    def decode(self, token_ids: List[int]) -> str:
-        """Decode token IDs back into text."""
-        id_to_token = {idx: token for token, idx in self.vocab.items()}
-        tokens = [id_to_token[tid] for tid in token_ids if tid in id_to_token]
-        text_unicode = ''.join(tokens).replace('</w>', '')
-        
-        try:
-            text_bytes = bytes([self.byte_decoder[c] for c in text_unicode])
-            text = text_bytes.decode('utf-8', errors='replace')
-        except:
-            text = text_unicode
-        
-        return text
-    
-    def load(self, filepath: str):
-        """Load the tokenizer from a file."""
-        with open(filepath, 'rb') as f:
-            data = pickle.load(f)
-            self.vocab_size = data['vocab_size']
-            self.vocab = data['vocab']
-            self.merges = data['merges']
-            self.byte_encoder = data['byte_encoder']
-            self.byte_decoder = {v: k for k, v in self.byte_encoder.items()}
+from bpe_tokenizer import BPETokenizer
 
 
 # Load the trained tokenizer
@@ -129,16 +26,15 @@ def tokenize_text(text: str):
         return "⚠️ Please enter some text to tokenize.", "", "", "", ""
     
     try:
-        # Encode
-        token_ids = tokenizer.encode(text)
-        
-        # Decode
-        decoded = tokenizer.decode(token_ids)
+        # Encode and decode
+        result = tokenizer.encode_plus(text)
+        token_ids = result['token_ids']
+        decoded = result['decoded']
         
         # Statistics
-        original_bytes = len(text.encode('utf-8'))
+        original_bytes = result['num_bytes']
         num_tokens = len(token_ids)
-        compression_ratio = original_bytes / num_tokens if num_tokens > 0 else 0
+        compression_ratio = result['compression_ratio']
         match = "✅ Perfect match!" if decoded == text else "⚠️ Decoding mismatch"
         
         # Format output
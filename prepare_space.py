@@ -0,0 +1,47 @@
+"""
+Prepare huggingface_files/ for deployment as a Hugging Face Space
+
+The Space imports BPETokenizer from bpe_tokenizer.py next to app.py. The
+module is not kept in huggingface_files/ in the repository; this script
+copies it there and checks the copy, so the Space always ships the
+current tokenizer.
+"""
+
+import os
+import sys
+import shutil
+import filecmp
+
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+SPACE_DIR = os.path.join(ROOT_DIR, 'huggingface_files')
+
+# Files from the repository root the Space needs next to app.py
+SHARED_FILES = ['bpe_tokenizer.py']
+
+
+def prepare_space(space_dir=SPACE_DIR):
+    """
+    Copy the shared files into space_dir and verify the copies.
+    
+    Args:
+        space_dir: Directory holding the Space's app.py
+    
+    Returns:
+        True if every copy matches its source
+    """
+    ok = True
+    for name in SHARED_FILES:
+        source = os.path.join(ROOT_DIR, name)
+        target = os.path.join(space_dir, name)
+        shutil.copyfile(source, target)
+        if filecmp.cmp(source, target, shallow=False):
+            print(f"Copied {name} to {space_dir}")
+        else:
+            print(f"✗ {target} does not match {source}")
+            ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if prepare_space() else 1)
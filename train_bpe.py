@@ -1,157 +1,326 @@
 """
 Train BPE tokenizer on Odia corpus
+
+The corpus is kept as a tuple of UTF-8 encoded bytes lines and packed into
+one buffer plus an offsets array. Training sees each distinct line once,
+weighted by its count; the corpus statistics and the compression ratio are
+computed from the packed buffer.
 """
 
+import os
 import sys
-from bpe_tokenizer import BPETokenizer
+import random
+from array import array
+from collections import Counter
+from itertools import accumulate
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from bpe_tokenizer import BPETokenizer, _write_atomic
 from download_odia_corpus import create_extended_corpus, save_corpus
 import json
 
 
-def train_tokenizer(vocab_size=4500, corpus_file="odia_corpus.txt"):
+# Assignment requirements for a trained tokenizer
+MAX_VOCAB_SIZE = 5000
+MIN_COMPRESSION_RATIO = 3.2
+
+# The tokenizer file is written in the background while compression is
+# measured; train_tokenizer() waits for it before returning. A single worker
+# keeps writes in submission order, so a later write to the same file always
+# wins.
+_io_pool = ThreadPoolExecutor(max_workers=1)
+_pending_writes = []
+
+
+def _submit_write(fn, *args):
+    """Queue a file write on the background writer."""
+    _pending_writes.append(_io_pool.submit(fn, *args))
+
+
+def _wait_for_writes():
+    """Block until all queued writes are done, then re-raise the first failure."""
+    error = None
+    while _pending_writes:
+        try:
+            _pending_writes.pop(0).result()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+
+
+def _save_results(results, results_file):
+    """Write training results as JSON, replacing results_file atomically."""
+    _write_atomic(results_file, json.dumps(results, indent=2))
+    print(f"Results saved to {results_file}")
+
+
+def _pack_texts(texts):
     """
-    Train the BPE tokenizer with specified vocabulary size.
+    Pack UTF-8 texts into one buffer plus byte offsets.
+    
+    Text i is buf[offsets[i]:offsets[i+1]], and offsets[-1] is the total
+    number of bytes.
+    
+    Returns:
+        Tuple of (buf, offsets)
+    """
+    buf = b''.join(texts)
+    offsets = array('q', accumulate(map(len, texts), initial=0))
+    return buf, offsets
+
+
+@lru_cache(maxsize=4)
+def _read_corpus(corpus_file, mtime):
+    """
+    Read the non-empty stripped lines of a corpus file as UTF-8 bytes.
+    
+    Cached per (path, modification time), so repeated train_tokenizer()
+    calls during a sweep read and pack the file only once.
+    
+    Returns:
+        Tuple of (texts, buf, offsets, total_chars), see _pack_texts()
+    """
+    # One bulk read, then split/strip/filter all run in C
+    with open(corpus_file, 'rb') as f:
+        data = f.read()
+    texts = tuple(filter(None, map(bytes.strip, data.split(b'\n'))))
+    
+    # Count characters with a single decode of the packed buffer
+    buf, offsets = _pack_texts(texts)
+    total_chars = len(buf.decode('utf-8'))
+    return texts, buf, offsets, total_chars
+
+
+def _load_corpus(corpus_file, verbose=True):
+    """
+    Load the corpus, creating and saving it first if the file is missing.
     
     Args:
-        vocab_size: Target vocabulary size (must be < 5000)
         corpus_file: Path to corpus file
+        verbose: Whether to report loading progress
+        
+    Returns:
+        Tuple of (texts, buf, offsets, total_chars), see _pack_texts()
     """
-    print("="*60)
-    print("BPE TOKENIZER TRAINING FOR ODIA LANGUAGE")
-    print("="*60)
-    
-    # Load or create corpus
     try:
-        print(f"\nLoading corpus from {corpus_file}...")
-        with open(corpus_file, 'r', encoding='utf-8') as f:
-            texts = [line.strip() for line in f if line.strip()]
-        print(f"Loaded {len(texts)} texts from file")
+        if verbose:
+            print(f"\nLoading corpus from {corpus_file}...")
+        corpus = _read_corpus(corpus_file, os.path.getmtime(corpus_file))
+        if verbose:
+            print(f"Loaded {len(corpus[0])} texts from file")
+        return corpus
     except FileNotFoundError:
         print(f"\nCorpus file not found. Creating new corpus...")
         texts = create_extended_corpus()
         save_corpus(texts, corpus_file)
+        total_chars = sum(map(len, texts))
+        texts = tuple(text.encode('utf-8') for text in texts)
+        return (texts,) + _pack_texts(texts) + (total_chars,)
+
+
+def train_tokenizer(vocab_size=4500, corpus_file="odia_corpus.txt", base_tokenizer=None, sample_frac=1.0,
+                    stop_sizes=None, verbose=True, persist=True, evaluate=True):
+    """
+    Train the BPE tokenizer with specified vocabulary size.
     
-    # Statistics about corpus
-    total_chars = sum(len(text) for text in texts)
-    total_bytes = sum(len(text.encode('utf-8')) for text in texts)
+    Args:
+        vocab_size: Target vocabulary size (must be < 5000)
+        corpus_file: Path to corpus file
+        base_tokenizer: Tokenizer already trained on the same corpus with a
+            vocab_size of at least vocab_size; it is reused, with its merges
+            truncated in place, instead of training again
+        sample_frac: Fraction of the corpus, sampled with a fixed seed, used
+            to estimate the compression ratio (1.0 uses every text)
+        stop_sizes: Smaller vocabulary sizes to check while training; training
+            stops at the first one whose compression meets the requirements,
+            and that size is used instead of vocab_size. With sample_frac < 1
+            a size that passes on the sample is confirmed on the full corpus
+            before stopping, since training cannot resume afterwards
+        verbose: Whether to print the corpus statistics, training progress
+            and requirements report
+        persist: Whether to save the tokenizer and training results files
+        evaluate: Whether to measure compression after training; if False,
+            compression_ratio and requirements_met are returned as None and
+            no results file is written
+    """
+    if verbose:
+        print("="*60)
+        print("BPE TOKENIZER TRAINING FOR ODIA LANGUAGE")
+        print("="*60)
     
-    print(f"\nCorpus Statistics:")
-    print(f"  Number of texts: {len(texts)}")
-    print(f"  Total characters: {total_chars:,}")
-    print(f"  Total bytes (UTF-8): {total_bytes:,}")
-    print(f"  Average text length: {total_chars/len(texts):.1f} chars")
+    # Load or create corpus
+    texts, buf, offsets, total_chars = _load_corpus(corpus_file, verbose)
+    total_bytes = offsets[-1]
+    
+    # Statistics about corpus
+    if verbose:
+        print(f"\nCorpus Statistics:")
+        print(f"  Number of texts: {len(texts)}")
+        print(f"  Total characters: {total_chars:,}")
+        print(f"  Total bytes (UTF-8): {total_bytes:,}")
+        print(f"  Average text length: {total_chars/len(texts):.1f} chars")
     
     # Initialize and train tokenizer
-    print(f"\n{'='*60}")
-    print(f"Training BPE with target vocab size: {vocab_size}")
-    print(f"{'='*60}\n")
+    if verbose:
+        print(f"\n{'='*60}")
+        print(f"Training BPE with target vocab size: {vocab_size}")
+        print(f"{'='*60}\n")
     
-    tokenizer = BPETokenizer(vocab_size=vocab_size)
-    tokenizer.train(texts, verbose=True)
+    # Texts the compression ratio is measured on, packed like the corpus
+    eval_texts = texts
+    eval_buf, eval_offsets = buf, offsets
+    if sample_frac < 1.0:
+        eval_texts = random.Random(0).sample(texts, max(1, int(len(texts) * sample_frac)))
+        eval_buf, eval_offsets = _pack_texts(eval_texts)
     
-    # Calculate compression ratio
-    print(f"\n{'='*60}")
-    print("EVALUATING TOKENIZER")
-    print(f"{'='*60}\n")
+    if base_tokenizer is not None:
+        if verbose:
+            print(f"Truncating the merges of the vocab_size={base_tokenizer.vocab_size} tokenizer")
+        tokenizer = base_tokenizer
+        tokenizer.set_active_merges(tokenizer.merges_for_vocab_size(vocab_size))
+        tokenizer.vocab_size = vocab_size
+    else:
+        callback = None
+        if stop_sizes:
+            stop_sizes = set(stop_sizes)
+            
+            def callback(tokenizer, size):
+                """Stop at the first checked size that meets the requirements."""
+                if size not in stop_sizes or size >= vocab_size:
+                    return False
+                # Make the merges learned so far usable for encoding
+                tokenizer.set_active_merges(len(tokenizer.merges))
+                compression_ratio = tokenizer.calculate_compression_ratio_packed(eval_buf, eval_offsets)
+                print(f"Checked vocab_size={size}: compression ratio {compression_ratio:.4f}")
+                if compression_ratio >= MIN_COMPRESSION_RATIO and sample_frac < 1.0:
+                    compression_ratio = tokenizer.calculate_compression_ratio_packed(buf, offsets)
+                    print(f"Checked vocab_size={size} on the full corpus: compression ratio {compression_ratio:.4f}")
+                return size < MAX_VOCAB_SIZE and compression_ratio >= MIN_COMPRESSION_RATIO
+        
+        # Repeated lines are counted once and weighted; compression is still
+        # measured on every text
+        tokenizer = BPETokenizer(vocab_size=vocab_size)
+        tokenizer.train_weighted(Counter(texts).items(), verbose=verbose, callback=callback)
+        if tokenizer.vocab_size != vocab_size:
+            vocab_size = tokenizer.vocab_size
+            if verbose:
+                print(f"Training stopped early at vocab_size={vocab_size}")
     
-    compression_ratio = tokenizer.calculate_compression_ratio(texts)
+    # Save tokenizer in the background while compression is measured; the
+    # learned state is not modified from here on
+    if persist:
+        tokenizer_file = f"odia_bpe_tokenizer_{vocab_size}.bin"
+        _submit_write(tokenizer.save_binary, tokenizer_file)
+    
+    if not evaluate:
+        _wait_for_writes()
+        return tokenizer, None, None
+    
+    # Calculate compression ratio
+    if verbose:
+        print(f"\n{'='*60}")
+        print("EVALUATING TOKENIZER")
+        print(f"{'='*60}\n")
+        
+        if sample_frac < 1.0:
+            print(f"Estimating compression on a {sample_frac:.0%} sample ({len(eval_texts)} texts)")
+    compression_ratio = tokenizer.calculate_compression_ratio_packed(eval_buf, eval_offsets)
     
     # Get tokenizer statistics
     stats = tokenizer.get_stats()
     
-    print(f"\nFinal Statistics:")
-    print(f"  Vocabulary size: {stats['vocab_size']}")
-    print(f"  Number of merges: {stats['num_merges']}")
-    print(f"  Compression ratio: {compression_ratio:.4f}")
-    
     # Check if requirements are met
-    print(f"\n{'='*60}")
-    print("REQUIREMENTS CHECK")
-    print(f"{'='*60}")
-    
-    vocab_ok = stats['vocab_size'] < 5000
-    compression_ok = compression_ratio >= 3.2
+    vocab_ok = stats['vocab_size'] < MAX_VOCAB_SIZE
+    compression_ok = compression_ratio >= MIN_COMPRESSION_RATIO
+    requirements_met = vocab_ok and compression_ok
     
-    print(f"  ✓ Vocabulary < 5000: {vocab_ok} (actual: {stats['vocab_size']})")
-    print(f"  ✓ Compression ≥ 3.2: {compression_ok} (actual: {compression_ratio:.4f})")
-    
-    if vocab_ok and compression_ok:
-        print(f"\n{'='*60}")
-        print("✓ ALL REQUIREMENTS MET!")
-        print(f"{'='*60}\n")
-    else:
+    if verbose:
+        print(f"\nFinal Statistics:")
+        print(f"  Vocabulary size: {stats['vocab_size']}")
+        print(f"  Number of merges: {stats['num_merges']}")
+        print(f"  Compression ratio: {compression_ratio:.4f}")
+        
         print(f"\n{'='*60}")
-        print("✗ REQUIREMENTS NOT MET - Need to adjust parameters")
-        print(f"{'='*60}\n")
+        print("REQUIREMENTS CHECK")
+        print(f"{'='*60}")
+        
+        print(f"  ✓ Vocabulary < 5000: {vocab_ok} (actual: {stats['vocab_size']})")
+        print(f"  ✓ Compression ≥ 3.2: {compression_ok} (actual: {compression_ratio:.4f})")
         
-        if not compression_ok:
-            print("  Suggestion: Try reducing vocab_size to increase compression")
-        if not vocab_ok:
-            print("  Suggestion: Reduce vocab_size parameter")
+        if requirements_met:
+            print(f"\n{'='*60}")
+            print("✓ ALL REQUIREMENTS MET!")
+            print(f"{'='*60}\n")
+        else:
+            print(f"\n{'='*60}")
+            print("✗ REQUIREMENTS NOT MET - Need to adjust parameters")
+            print(f"{'='*60}\n")
+            
+            if not compression_ok:
+                print("  Suggestion: Try reducing vocab_size to increase compression")
+            if not vocab_ok:
+                print("  Suggestion: Reduce vocab_size parameter")
     
-    # Save tokenizer
-    tokenizer_file = f"odia_bpe_tokenizer_{vocab_size}.pkl"
-    tokenizer.save(tokenizer_file)
+    # The tokenizer file exists once this returns, and a failed save raises here
+    _wait_for_writes()
     
     # Save statistics
-    results = {
-        'vocab_size': stats['vocab_size'],
-        'num_merges': stats['num_merges'],
-        'compression_ratio': compression_ratio,
-        'requirements_met': vocab_ok and compression_ok,
-        'corpus_texts': len(texts),
-        'corpus_bytes': total_bytes,
-    }
-    
-    results_file = f"training_results_{vocab_size}.json"
-    with open(results_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2)
-    print(f"Results saved to {results_file}")
+    if persist:
+        results = {
+            'vocab_size': stats['vocab_size'],
+            'num_merges': stats['num_merges'],
+            'compression_ratio': compression_ratio,
+            'requirements_met': requirements_met,
+            'corpus_texts': len(texts),
+            'corpus_bytes': total_bytes,
+        }
+        
+        results_file = f"training_results_{vocab_size}.json"
+        _save_results(results, results_file)
     
-    return tokenizer, compression_ratio, vocab_ok and compression_ok
+    return tokenizer, compression_ratio, requirements_met
 
 
-def find_optimal_vocab_size():
+def find_optimal_vocab_size(sample_frac=0.15):
     """
-    Try different vocabulary sizes to find one that meets requirements.
+    Find the smallest candidate vocabulary size that meets the requirements.
+    
+    Args:
+        sample_frac: Fraction of the corpus used to screen candidates while
+            searching; a candidate that passes is confirmed on the full corpus
     """
     print("\nSearching for optimal vocabulary size...")
     print("="*60)
     
-    # Try different vocabulary sizes
-    vocab_sizes = [4500, 4000, 3500, 3000, 2500, 2000]
+    # Candidate vocabulary sizes, smallest first
+    vocab_sizes = sorted([4500, 4000, 3500, 3000, 2500, 2000])
     
-    best_tokenizer = None
-    best_vocab_size = None
-    best_compression = 0
+    # Train towards the largest size only once. Compression grows with vocab
+    # size, so the smaller candidates are checked in increasing order as
+    # training reaches them, and training stops at the first that meets the
+    # requirements on the full corpus. If none does, the largest size is the
+    # best result.
+    print(f"\n\nTrying vocab sizes {', '.join(map(str, vocab_sizes))}...")
+    print("-"*60)
+    max_tokenizer, _, _ = train_tokenizer(vocab_sizes[-1], sample_frac=sample_frac, stop_sizes=vocab_sizes,
+                                          verbose=False, persist=False, evaluate=False)
+    vocab_size = max_tokenizer.vocab_size
     
-    for vocab_size in vocab_sizes:
-        print(f"\n\nTrying vocab_size = {vocab_size}...")
-        print("-"*60)
-        
-        tokenizer, compression_ratio, requirements_met = train_tokenizer(vocab_size)
-        
-        if requirements_met:
-            print(f"\n✓ Found suitable configuration!")
-            print(f"  Vocab size: {vocab_size}")
-            print(f"  Compression ratio: {compression_ratio:.4f}")
-            return tokenizer, vocab_size, compression_ratio
-        
-        if compression_ratio > best_compression:
-            best_tokenizer = tokenizer
-            best_vocab_size = vocab_size
-            best_compression = compression_ratio
-        
-        # If compression ratio is already above target, we found it
-        if compression_ratio >= 3.2:
-            print(f"\n✓ Found suitable configuration!")
-            return tokenizer, vocab_size, compression_ratio
+    # Evaluate the chosen size on the full corpus; only its files are saved
+    print(f"\n\nEvaluating vocab_size = {vocab_size} on the full corpus...")
+    print("-"*60)
+    tokenizer, compression_ratio, requirements_met = train_tokenizer(vocab_size, base_tokenizer=max_tokenizer,
+                                                                     verbose=False)
     
-    print(f"\nBest result found:")
-    print(f"  Vocab size: {best_vocab_size}")
-    print(f"  Compression ratio: {best_compression:.4f}")
+    if requirements_met:
+        print(f"\n✓ Found suitable configuration!")
+    else:
+        print(f"\nBest result found:")
+    print(f"  Vocab size: {vocab_size}")
+    print(f"  Compression ratio: {compression_ratio:.4f}")
     
-    return best_tokenizer, best_vocab_size, best_compression
+    return tokenizer, vocab_size, compression_ratio
 
 
 if __name__ == "__main__":